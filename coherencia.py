@@ -0,0 +1,102 @@
+"""
+coherencia.py
+
+Coherencia entre workers (varios procesos uvicorn sobre la misma DB SQLite):
+- Cada commit de negocio escribe una fila en la tabla Cambio (ver models.py).
+- Cada worker consulta 'PRAGMA data_version' en una conexión propia; ese valor
+  solo cambia cuando OTRA conexión confirma una escritura, así que la consulta
+  es casi gratuita mientras no haya cambios.
+- Cuando cambia, se leen solo los Cambios con ID mayor al último visto y se
+  entregan a los oyentes registrados (feed, cachés, índices...), que invalidan
+  o refrescan de forma incremental. La desactualización máxima es INTERVALO_SEGUNDOS.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from database import SQLITE_FILE_NAME
+from eventos import HISTORIAL_MAXIMO, difusor, evento_desde_cambio
+from models import Cambio
+
+# VENTANA MÁXIMA DE DESACTUALIZACIÓN ENTRE WORKERS
+INTERVALO_SEGUNDOS = 0.5
+
+Oyente = Callable[[Dict[str, Any]], None]
+
+
+class VigilanteCambios:
+    """Hilo en segundo plano que sincroniza el estado en memoria con la tabla Cambio."""
+
+    def __init__(self, db_path: str = SQLITE_FILE_NAME, intervalo: float = INTERVALO_SEGUNDOS):
+        self.db_path = db_path
+        self.intervalo = intervalo
+        self.ultima_version = 0
+        self._oyentes: List[Oyente] = []
+        self._detener = threading.Event()
+        self._hilo = None
+        self._conexion = None
+        self._data_version = None
+
+    def registrar_oyente(self, oyente: Oyente) -> None:
+        """Registra una función que recibe cada evento de cambio (en orden de versión)."""
+        self._oyentes.append(oyente)
+
+    def iniciar(self) -> None:
+        """Abre la conexión propia, precarga el historial reciente y arranca el hilo."""
+        self._conexion = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Precarga: los clientes pueden reanudar el feed aunque el worker sea nuevo
+        ultima = self._conexion.execute(f"SELECT COALESCE(MAX(id), 0) FROM {Cambio.__tablename__}").fetchone()[0]
+        self.ultima_version = max(ultima - HISTORIAL_MAXIMO, 0)
+        self.sincronizar()
+        self._hilo = threading.Thread(target=self._bucle, name="vigilante-cambios", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+        if self._conexion:
+            self._conexion.close()
+
+    def _bucle(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.sincronizar()
+            except sqlite3.Error as e:
+                # DB bloqueada u ocupada: se reintenta en el siguiente intervalo
+                print(f"ERROR COHERENCIA: {e}")
+
+    def sincronizar(self) -> int:
+        """Entrega los cambios nuevos a los oyentes. Devuelve cuántos cambios se aplicaron."""
+        data_version = self._conexion.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return 0
+        self._data_version = data_version
+
+        filas = self._conexion.execute(
+            f"SELECT id, entidad, accion, clave, datos, fecha FROM {Cambio.__tablename__} "
+            "WHERE id > ? ORDER BY id",
+            (self.ultima_version,),
+        ).fetchall()
+
+        for id_, entidad, accion, clave, datos, fecha in filas:
+            cambio = Cambio(
+                id=id_, entidad=entidad, accion=accion, clave=clave, datos=datos,
+                fecha=datetime.fromisoformat(fecha),
+            )
+            evento = evento_desde_cambio(cambio)
+            for oyente in self._oyentes:
+                try:
+                    oyente(evento)
+                except Exception as e:
+                    # Un oyente con error no debe bloquear a los demás ni la versión
+                    print(f"ERROR OYENTE DE CAMBIOS: {e}")
+            self.ultima_version = id_
+        return len(filas)
+
+
+# INSTANCIA ÚNICA POR WORKER. El feed de cambios es el primer oyente.
+vigilante = VigilanteCambios()
+vigilante.registrar_oyente(difusor.publicar)
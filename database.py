@@ -1,6 +1,8 @@
 from sqlmodel import create_engine, SQLModel, Session
+from sqlalchemy.schema import CreateTable, CreateIndex
 from typing import Generator
 import os 
+import sqlite3
 import models 
 
 #NOMBRE DEL ARCHIVO DE LA BASE DE DATOS SQLITE
@@ -18,6 +20,66 @@ def create_db_and_tables():
     #Crea la base de datos y las tablas si no existen.
     print(f"--- CREANDO O VERIFICANDO LA BASE DE DATOS LOCAL: {SQLITE_FILE_NAME} ---")
     SQLModel.metadata.create_all(engine)
+    migrar_esquema(SQLITE_FILE_NAME)
+
+
+def migrar_esquema(db_path: str):
+    """
+    Ajustes que create_all no hace sobre tablas ya existentes.
+    Se ejecuta dentro de BEGIN IMMEDIATE: si varios workers arrancan a la vez,
+    solo el primero migra y los demás encuentran el esquema ya actualizado.
+    """
+    conexion = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            _migrar_compra_autoincrement(conexion)
+            _migrar_fecha_baja(conexion)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+    finally:
+        conexion.close()
+
+
+def _migrar_compra_autoincrement(conexion: sqlite3.Connection):
+    # Sin AUTOINCREMENT, SQLite reutiliza los IDs de compras archivadas (ver retencion.py)
+    tabla = models.Compra.__table__
+    fila = conexion.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla.name,)
+    ).fetchone()
+    if fila is None or "AUTOINCREMENT" in fila[0].upper():
+        return
+    print(f"--- MIGRANDO TABLA {tabla.name}: IDs NO REUTILIZABLES (AUTOINCREMENT) ---")
+    for indice in tabla.indexes:
+        conexion.execute(f"DROP INDEX IF EXISTS {indice.name}")
+    conexion.execute(f"ALTER TABLE {tabla.name} RENAME TO _{tabla.name}_anterior")
+    conexion.execute(str(CreateTable(tabla).compile(engine)))
+    for indice in tabla.indexes:
+        conexion.execute(str(CreateIndex(indice).compile(engine)))
+    columnas = ", ".join(columna.name for columna in tabla.columns)
+    conexion.execute(f"INSERT INTO {tabla.name} ({columnas}) SELECT {columnas} FROM _{tabla.name}_anterior")
+    conexion.execute(f"DROP TABLE _{tabla.name}_anterior")
+
+
+def _migrar_fecha_baja(conexion: sqlite3.Connection):
+    # Columna fecha_baja en Usuario y Vehiculo. Para las bajas anteriores se toma
+    # el Cambio 'eliminar' si existe; si no, queda NULL y la retención no las archiva.
+    cambio = models.Cambio.__tablename__
+    for modelo, entidad, clave in ((models.Usuario, "usuario", "cedula"), (models.Vehiculo, "vehiculo", "placa")):
+        tabla = modelo.__tablename__
+        columnas = [fila[1] for fila in conexion.execute(f"PRAGMA table_info({tabla})")]
+        if not columnas or "fecha_baja" in columnas:
+            continue
+        conexion.execute(f"ALTER TABLE {tabla} ADD COLUMN fecha_baja DATETIME")
+        conexion.execute(
+            f"UPDATE {tabla} SET fecha_baja = ("
+            f"SELECT MAX(c.fecha) FROM {cambio} c "
+            f"WHERE c.entidad = ? AND c.accion = 'eliminar' AND c.clave = {tabla}.{clave}) "
+            "WHERE estado = 0",
+            (entidad,),
+        )
 
 
 # CLAVE: Esta función ahora devuelve una sesión SÍNCRONA
@@ -0,0 +1,194 @@
+"""
+eventos.py
+
+Feed de cambios en vivo del catálogo (Usuario, Vehiculo, FichaTecnica, Compra):
+- Los endpoints registran un Cambio compacto en la misma transacción del commit.
+- El vigilante de coherencia (coherencia.py) lee esos cambios en cada worker y
+  los entrega al difusor, así todos los workers publican el mismo feed.
+- El offset de cada evento es el ID del Cambio en la DB, por lo que los
+  clientes pueden reanudar desde el último offset recibido en cualquier worker.
+- Cada suscriptor tiene su propio buffer acotado; si un cliente lento lo
+  desborda se le desconecta y debe reanudar desde su último offset.
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session
+
+from models import Cambio
+
+# TAMAÑO DEL HISTORIAL EN MEMORIA (eventos disponibles para reanudar)
+HISTORIAL_MAXIMO = 1000
+# TAMAÑO DEL BUFFER DE CADA SUSCRIPTOR (eventos pendientes por enviar)
+BUFFER_SUSCRIPTOR = 256
+
+
+# ==================================================
+# 1. SUSCRIPTOR (Buffer acotado por cliente)
+# ==================================================
+class Suscriptor:
+    """Cliente conectado al feed (SSE o WebSocket) con su buffer propio."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maximo: int = BUFFER_SUSCRIPTOR):
+        self.loop = loop
+        self.maximo = maximo
+        self.cola: Deque[Dict[str, Any]] = deque()
+        self.desbordado = False
+        self._aviso = asyncio.Event()
+
+    def _entregar(self, evento: Dict[str, Any]) -> None:
+        # Se llama con el lock del difusor tomado, posiblemente desde otro hilo
+        if self.desbordado:
+            return
+        if len(self.cola) >= self.maximo:
+            # Cliente lento: se descarta su buffer y se le obliga a reanudar
+            self.desbordado = True
+            self.cola.clear()
+        else:
+            self.cola.append(evento)
+        self.loop.call_soon_threadsafe(self._aviso.set)
+
+    async def esperar(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Espera nuevos eventos y devuelve los pendientes (lista vacía si vence el timeout)."""
+        if not self.cola and not self.desbordado:
+            try:
+                await asyncio.wait_for(self._aviso.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._aviso.clear()
+        pendientes = []
+        while self.cola:
+            pendientes.append(self.cola.popleft())
+        return pendientes
+
+
+# ==================================================
+# 2. DIFUSOR EN PROCESO (Historial + suscriptores)
+# ==================================================
+class Difusor:
+    """
+    Difusor en memoria. Es seguro entre hilos porque los endpoints síncronos
+    de FastAPI se ejecutan en el threadpool, mientras que los streams corren
+    en el event loop.
+    """
+
+    def __init__(self, historial_maximo: int = HISTORIAL_MAXIMO):
+        self._lock = threading.Lock()
+        self._historial: Deque[Dict[str, Any]] = deque(maxlen=historial_maximo)
+        self._suscriptores: Set[Suscriptor] = set()
+        self._ultimo_offset = 0
+
+    @property
+    def ultimo_offset(self) -> int:
+        return self._ultimo_offset
+
+    def publicar(self, evento: Dict[str, Any]) -> None:
+        """Agrega un evento (ya con su offset) al historial y lo entrega a los suscriptores."""
+        with self._lock:
+            # Los eventos llegan en orden de offset; se ignoran duplicados
+            if evento["offset"] <= self._ultimo_offset:
+                return
+            self._ultimo_offset = evento["offset"]
+            self._historial.append(evento)
+            for suscriptor in self._suscriptores:
+                suscriptor._entregar(evento)
+
+    def _desde_sin_lock(self, desde: int) -> Tuple[List[Dict[str, Any]], bool]:
+        # Devuelve (eventos con offset > desde, completo). completo=False indica
+        # que el historial ya no contiene todos los eventos pedidos.
+        if desde >= self._ultimo_offset:
+            return [], True
+        primero = self._historial[0]["offset"] if self._historial else self._ultimo_offset + 1
+        completo = desde >= primero - 1
+        return [e for e in self._historial if e["offset"] > desde], completo
+
+    def eventos_desde(self, desde: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Deltas desde un offset dado (para consultas puntuales sin stream)."""
+        with self._lock:
+            return self._desde_sin_lock(desde)
+
+    def suscribir(self, desde: Optional[int] = None) -> Tuple[Suscriptor, List[Dict[str, Any]], bool]:
+        """
+        Registra un suscriptor en el event loop actual. Si se indica 'desde',
+        devuelve también los eventos atrasados de forma atómica con el registro,
+        de modo que no se pierde ningún evento entre la reanudación y el stream.
+        """
+        suscriptor = Suscriptor(asyncio.get_running_loop())
+        with self._lock:
+            atrasados, completo = ([], True) if desde is None else self._desde_sin_lock(desde)
+            self._suscriptores.add(suscriptor)
+        return suscriptor, atrasados, completo
+
+    def desuscribir(self, suscriptor: Suscriptor) -> None:
+        with self._lock:
+            self._suscriptores.discard(suscriptor)
+
+
+# INSTANCIA ÚNICA USADA POR LA APLICACIÓN
+difusor = Difusor()
+
+
+# ==================================================
+# 3. REGISTRO DE CAMBIOS POR ENTIDAD (Antes del commit)
+# ==================================================
+def evento_desde_cambio(cambio: Cambio) -> Dict[str, Any]:
+    """Convierte una fila de Cambio en el evento que se envía a los clientes."""
+    return {
+        "offset": cambio.id,
+        "entidad": cambio.entidad,
+        "accion": cambio.accion,
+        "clave": cambio.clave,
+        "datos": json.loads(cambio.datos),
+        "fecha": cambio.fecha.isoformat(),
+    }
+
+
+def _registrar(session: Session, entidad: str, accion: str, clave: Any, datos: Dict[str, Any]) -> None:
+    # Se agrega a la sesión del endpoint: se confirma (o revierte) junto al cambio
+    session.add(Cambio(entidad=entidad, accion=accion, clave=str(clave), datos=json.dumps(datos, default=str)))
+
+
+def registrar_usuario(session: Session, accion: str, usuario) -> None:
+    """
+    Registra un cambio de Usuario. Solo viaja la cédula: el feed es público y
+    los demás workers solo necesitan la clave para invalidar su estado.
+    """
+    _registrar(session, "usuario", accion, usuario.cedula, {})
+
+
+def registrar_vehiculo(session: Session, accion: str, vehiculo) -> None:
+    """Registra un cambio de Vehículo (solo los campos del catálogo)."""
+    datos = {}
+    if accion != "eliminar":
+        datos = {
+            "marca": vehiculo.marca,
+            "linea": vehiculo.linea,
+            "modelo": vehiculo.modelo,
+            "precio": vehiculo.precio,
+            "nivel_seguridad": vehiculo.nivel_seguridad,
+            "foto_url": vehiculo.foto_url,
+        }
+    _registrar(session, "vehiculo", accion, vehiculo.placa, datos)
+
+
+def registrar_ficha_tecnica(session: Session, accion: str, ficha) -> None:
+    """Registra un cambio de Ficha Técnica con sus datos actuales."""
+    _registrar(session, "ficha_tecnica", accion, ficha.vehiculo_placa, ficha.model_dump(exclude={"vehiculo_placa"}))
+
+
+def registrar_compra(session: Session, accion: str, compra) -> None:
+    """Registra una transacción de Compra. Hace flush para conocer el ID asignado."""
+    session.flush()
+    datos = {
+        "comprador_cedula": compra.comprador_cedula,
+        "vehiculo_placa": compra.vehiculo_placa,
+        "precio_final": compra.precio_final,
+        "tipo_pago": compra.tipo_pago,
+        "estado": compra.estado,
+        "fecha_compra": compra.fecha_compra.isoformat(),
+    }
+    _registrar(session, "compra", accion, compra.id, datos)
@@ -0,0 +1,276 @@
+"""
+exportacion.py
+
+Exportación columnar del histórico de Compras para reportes offline (Finanzas):
+- Primero copia la DB (y la DB de archivo de retencion.py) a un snapshot temporal
+  con la API de backup de SQLite; la lectura por bloques (fetchmany) se hace sobre
+  el snapshot, así un reporte largo no deja bloqueadas las escrituras de la API.
+- Incluye las compras archivadas por la retención: el snapshot completo nunca
+  pierde histórico aunque ya no esté en la DB principal.
+- Escribe archivos Parquet comprimidos (zstd) particionados por mes de fecha_compra:
+  exportaciones/compras/mes=AAAA-MM/parte-<primer_id>-<ultimo_id>.parquet
+- Exportación incremental: _estado.json guarda el último ID exportado y cada
+  ejecución solo agrega las compras con ID mayor. Es correcto porque Compra es
+  AUTOINCREMENT y la retención mantiene la secuencia por encima de los IDs archivados.
+- consultar() lee los Parquet con memory map para consultas locales.
+
+Se ejecuta como proceso aparte (nunca desde la API), por ejemplo con cron:
+    python exportacion.py exportar
+    python exportacion.py consultar --mes 2025-11
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from database import SQLITE_FILE_NAME
+from models import Compra, Usuario, Vehiculo
+from retencion import ARCHIVO_FILE_NAME, crear_tablas_archivo
+
+# CONFIGURACIÓN DE LA EXPORTACIÓN
+DIRECTORIO_EXPORTACION = os.path.join("exportaciones", "compras")
+ARCHIVO_ESTADO = "_estado.json"
+FILAS_POR_BLOQUE = 5000
+COMPRESION = "zstd"
+
+# Esquema del histórico unido (Compra + datos del Vehículo y del Comprador)
+ESQUEMA = pa.schema([
+    ("id", pa.int64()),
+    ("fecha_compra", pa.timestamp("us")),
+    ("precio_final", pa.float64()),
+    ("tipo_pago", pa.string()),
+    ("estado", pa.string()),
+    ("comprador_cedula", pa.string()),
+    ("vehiculo_placa", pa.string()),
+    ("marca", pa.string()),
+    ("linea", pa.string()),
+    ("modelo", pa.int32()),
+    ("precio_lista", pa.float64()),
+    ("nivel_seguridad", pa.int32()),
+    ("comprador_nombre", pa.string()),
+    ("comprador_edad", pa.int32()),
+    ("categoria_licencia", pa.string()),
+])
+
+_COLUMNAS_COMPRA = "id, fecha_compra, precio_final, tipo_pago, estado, comprador_cedula, vehiculo_placa"
+_COLUMNAS_VEHICULO = "placa, marca, linea, modelo, precio, nivel_seguridad"
+_COLUMNAS_USUARIO = "cedula, nombres_completo, edad, categoria_licencia"
+
+
+def _activos_y_archivados(tabla: str, clave: str, columnas: str) -> str:
+    # Filas de la DB principal + la versión archivada más reciente de las que ya no están
+    return f"""
+        SELECT {columnas} FROM main.{tabla}
+        UNION ALL
+        SELECT {columnas} FROM archivo.{tabla} a
+        WHERE a.{clave} NOT IN (SELECT {clave} FROM main.{tabla})
+          AND a.archivo_id = (SELECT MAX(b.archivo_id) FROM archivo.{tabla} b WHERE b.{clave} = a.{clave})"""
+
+
+CONSULTA_HISTORICO = f"""
+    WITH compras AS (
+        SELECT {_COLUMNAS_COMPRA} FROM main.{Compra.__tablename__}
+        UNION ALL
+        SELECT {_COLUMNAS_COMPRA} FROM archivo.{Compra.__tablename__}
+    ),
+    vehiculos AS ({_activos_y_archivados(Vehiculo.__tablename__, "placa", _COLUMNAS_VEHICULO)}),
+    usuarios AS ({_activos_y_archivados(Usuario.__tablename__, "cedula", _COLUMNAS_USUARIO)})
+    SELECT c.id, c.fecha_compra, c.precio_final, c.tipo_pago, c.estado,
+           c.comprador_cedula, c.vehiculo_placa,
+           v.marca, v.linea, v.modelo, v.precio, v.nivel_seguridad,
+           u.nombres_completo, u.edad, u.categoria_licencia
+    FROM compras c
+    LEFT JOIN vehiculos v ON v.placa = c.vehiculo_placa
+    LEFT JOIN usuarios u ON u.cedula = c.comprador_cedula
+    WHERE c.id > ?
+    ORDER BY c.id
+"""
+
+
+# ==================================================
+# 1. ESTADO DE LA EXPORTACIÓN INCREMENTAL
+# ==================================================
+def leer_estado(directorio: str = DIRECTORIO_EXPORTACION) -> Dict[str, Any]:
+    """Devuelve el estado de la última exportación ({'ultimo_id': 0} si no hay ninguna)."""
+    ruta = os.path.join(directorio, ARCHIVO_ESTADO)
+    if not os.path.exists(ruta):
+        return {"ultimo_id": 0}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def _guardar_estado(directorio: str, estado: Dict[str, Any]) -> None:
+    # Escritura atómica: un corte a mitad no deja un estado corrupto
+    ruta = os.path.join(directorio, ARCHIVO_ESTADO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(estado, archivo, indent=2)
+    os.replace(ruta + ".tmp", ruta)
+
+
+# ==================================================
+# 2. EXPORTACIÓN (Snapshot -> Streaming por bloques -> Parquet por mes)
+# ==================================================
+def _copiar_snapshot(origen: str, destino: str) -> None:
+    # backup() copia las páginas en un solo paso: el bloqueo compartido sobre la DB
+    # viva dura lo que tarda la copia, no lo que tarda el reporte
+    fuente = sqlite3.connect(f"file:{origen}?mode=ro", uri=True)
+    copia = sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+
+
+def _abrir_snapshot(db_path: str, archivo_path: str, carpeta: str) -> sqlite3.Connection:
+    snapshot_db = os.path.join(carpeta, "principal.db")
+    snapshot_archivo = os.path.join(carpeta, "archivo.db")
+    _copiar_snapshot(db_path, snapshot_db)
+    if os.path.exists(archivo_path):
+        _copiar_snapshot(archivo_path, snapshot_archivo)
+    conexion = sqlite3.connect(snapshot_db)
+    conexion.execute("ATTACH DATABASE ? AS archivo", (snapshot_archivo,))
+    # Si aún no hay archivo (o es de la versión anterior) se crean/migran sus tablas en la copia
+    crear_tablas_archivo(conexion)
+    conexion.commit()
+    return conexion
+
+
+def _bloque_a_columnas(filas: List[tuple]) -> Dict[str, Dict[str, List[Any]]]:
+    # Agrupa las filas del bloque por mes y las transpone a columnas
+    por_mes: Dict[str, Dict[str, List[Any]]] = defaultdict(lambda: {campo.name: [] for campo in ESQUEMA})
+    for fila in filas:
+        fila = list(fila)
+        fila[1] = datetime.fromisoformat(fila[1])
+        columnas = por_mes[fila[1].strftime("%Y-%m")]
+        for campo, valor in zip(ESQUEMA, fila):
+            columnas[campo.name].append(valor)
+    return por_mes
+
+
+def exportar(
+    db_path: str = SQLITE_FILE_NAME,
+    directorio: str = DIRECTORIO_EXPORTACION,
+    archivo_path: str = ARCHIVO_FILE_NAME,
+    completo: bool = False,
+    filas_por_bloque: int = FILAS_POR_BLOQUE,
+) -> Dict[str, Any]:
+    """
+    Exporta las compras nuevas (o todas si completo=True) y devuelve un resumen.
+    Los archivos se escriben con sufijo .tmp y se renombran al final, y el estado
+    se actualiza solo después, así un fallo no deja el snapshot a medias.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    desde = 0 if completo else leer_estado(directorio)["ultimo_id"]
+
+    carpeta_snapshot = tempfile.TemporaryDirectory(prefix="autoseguro360_snapshot_")
+    conexion = _abrir_snapshot(db_path, archivo_path, carpeta_snapshot.name)
+    escritores: Dict[str, pq.ParquetWriter] = {}
+    temporales: Dict[str, str] = {}
+    filas_por_mes: Dict[str, int] = defaultdict(int)
+    ultimo_id = desde
+    try:
+        cursor = conexion.execute(CONSULTA_HISTORICO, (desde,))
+        while True:
+            filas = cursor.fetchmany(filas_por_bloque)
+            if not filas:
+                break
+            ultimo_id = filas[-1][0]
+            for mes, columnas in _bloque_a_columnas(filas).items():
+                if mes not in escritores:
+                    carpeta = os.path.join(directorio, f"mes={mes}")
+                    os.makedirs(carpeta, exist_ok=True)
+                    temporales[mes] = os.path.join(carpeta, f"parte-{desde + 1:09d}.parquet.tmp")
+                    escritores[mes] = pq.ParquetWriter(temporales[mes], ESQUEMA, compression=COMPRESION)
+                escritores[mes].write_table(pa.table(columnas, schema=ESQUEMA))
+                filas_por_mes[mes] += len(columnas["id"])
+    finally:
+        conexion.close()
+        carpeta_snapshot.cleanup()
+        for escritor in escritores.values():
+            escritor.close()
+
+    if completo:
+        # Una exportación completa reemplaza los archivos anteriores
+        for carpeta in os.listdir(directorio):
+            ruta_mes = os.path.join(directorio, carpeta)
+            if carpeta.startswith("mes=") and os.path.isdir(ruta_mes):
+                for nombre in os.listdir(ruta_mes):
+                    if nombre.endswith(".parquet"):
+                        os.remove(os.path.join(ruta_mes, nombre))
+
+    for temporal in temporales.values():
+        os.replace(temporal, temporal[:-len(".parquet.tmp")] + f"-{ultimo_id:09d}.parquet")
+
+    resumen = {
+        "fecha": datetime.utcnow().isoformat(),
+        "desde_id": desde,
+        "ultimo_id": ultimo_id,
+        "filas": sum(filas_por_mes.values()),
+        "filas_por_mes": dict(sorted(filas_por_mes.items())),
+    }
+    _guardar_estado(directorio, resumen)
+    return resumen
+
+
+# ==================================================
+# 3. CONSULTA LOCAL (Lectura con memory map)
+# ==================================================
+def consultar(
+    meses: Optional[List[str]] = None,
+    columnas: Optional[List[str]] = None,
+    directorio: str = DIRECTORIO_EXPORTACION,
+) -> pa.Table:
+    """
+    Carga el histórico exportado (opcionalmente solo algunos meses 'AAAA-MM' y
+    algunas columnas). Los archivos se abren con memory map: solo se leen del
+    disco las páginas de las columnas pedidas.
+    """
+    tablas = []
+    if os.path.isdir(directorio):
+        for carpeta in sorted(os.listdir(directorio)):
+            if not carpeta.startswith("mes=") or (meses and carpeta[4:] not in meses):
+                continue
+            ruta_mes = os.path.join(directorio, carpeta)
+            for nombre in sorted(os.listdir(ruta_mes)):
+                if nombre.endswith(".parquet"):
+                    tablas.append(pq.read_table(os.path.join(ruta_mes, nombre), columns=columnas, memory_map=True))
+    if not tablas:
+        return ESQUEMA.empty_table() if columnas is None else pa.schema([ESQUEMA.field(c) for c in columnas]).empty_table()
+    return pa.concat_tables(tablas)
+
+
+def resumen_mensual(meses: Optional[List[str]] = None, directorio: str = DIRECTORIO_EXPORTACION) -> pa.Table:
+    """Número de compras y total vendido por mes y marca."""
+    tabla = consultar(meses, ["fecha_compra", "marca", "precio_final"], directorio)
+    tabla = tabla.append_column("mes", pc.strftime(tabla["fecha_compra"], format="%Y-%m"))
+    return tabla.group_by(["mes", "marca"]).aggregate([
+        ("precio_final", "count"),
+        ("precio_final", "sum"),
+    ]).sort_by([("mes", "ascending"), ("marca", "ascending")])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportación columnar del histórico de Compras.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_exportar = subcomandos.add_parser("exportar", help="Exporta las compras nuevas desde el último snapshot.")
+    p_exportar.add_argument("--completo", action="store_true", help="Reexporta todo el histórico.")
+
+    p_consultar = subcomandos.add_parser("consultar", help="Resumen mensual por marca del histórico exportado.")
+    p_consultar.add_argument("--mes", action="append", help="Mes AAAA-MM (se puede repetir).")
+
+    args = parser.parse_args()
+    if args.comando == "exportar":
+        print(json.dumps(exportar(completo=args.completo), indent=2))
+    else:
+        print(resumen_mensual(args.mes))
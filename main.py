@@ -9,6 +9,9 @@ from starlette.requests import Request # Asegúrate de tener esta importación
 
 from fastapi import Form, UploadFile, File # Añadir UploadFile y File
 from fastapi.responses import HTMLResponse # Necesaria para la respuesta HTML
+from fastapi.responses import StreamingResponse # Para el feed SSE
+from fastapi import WebSocket, WebSocketDisconnect # Para el feed WebSocket
+import json
 import shutil # Para manejar archivos
 
 #LIBRERÍAS PARA EL USO DE TEMPLATES CON FASTAPI
@@ -24,6 +27,11 @@ from sqlmodel import Session, select
 
 #IMPORTACIÓN DE MÓDULOS PROPIOS Y MODELOS
 from database import create_db_and_tables, get_session
+from eventos import difusor, registrar_usuario, registrar_vehiculo, registrar_ficha_tecnica, registrar_compra
+from coherencia import vigilante
+from retencion import (
+    retencion, programador_retencion, RestauracionError, NoArchivadoError, RetencionEnCursoError, RETENCION_DIAS
+)
 from models import (
     Usuario, UsuarioCreate, UsuarioRead, UsuarioUpdate,
     Vehiculo, VehiculoCreate, VehiculoRead, VehiculoUpdate,
@@ -74,6 +82,16 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 def on_startup():
     """Ejecuta la creación de la base de datos y tablas al iniciar la app."""
     create_db_and_tables()
+    # Sincroniza este worker con los cambios hechos por los demás workers
+    vigilante.iniciar()
+    # Archivo de filas inactivas y compactación periódica
+    programador_retencion.iniciar()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Detiene los hilos en segundo plano del worker."""
+    programador_retencion.detener()
+    vigilante.detener()
 
 
 @app.get("/", tags=["Root - Frontend"])
@@ -239,6 +257,7 @@ async def create_usuario_from_form(
 
     #Almacenar en la DB
     session.add(db_usuario)
+    registrar_usuario(session, "crear", db_usuario)
     session.commit()
     session.refresh(db_usuario)
     
@@ -252,6 +271,22 @@ async def create_usuario_from_form(
         context, 
         status_code=status.HTTP_201_CREATED
     )
+
+@app.delete("/usuarios/{cedula}", tags=["Usuarios"])
+def delete_usuario(cedula: str, session: Session = Depends(get_session)):
+    """Eliminación Lógica (Soft Delete): Marca el Usuario como inactivo."""
+    usuario = session.get(Usuario, cedula)
+    if not usuario or usuario.estado == False:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado o ya inactivo.")
+
+    usuario.estado = False # Soft Delete
+    usuario.fecha_baja = datetime.utcnow()
+    session.add(usuario)
+    registrar_usuario(session, "eliminar", usuario)
+    session.commit()
+
+    return {"message": f"Usuario con cédula {cedula} ha sido marcado como inactivo."}
+
 #ENDPOINTS PARA VEHÍCULO (CRUD Completo)
 @app.get("/vehiculos/registro", tags=["Vehiculos - Frontend"])
 def get_registro_vehiculo(request: Request):
@@ -334,6 +369,7 @@ async def create_vehiculo_from_form(
         )
 
     session.add(db_vehiculo)
+    registrar_vehiculo(session, "crear", db_vehiculo)
     session.commit()
     session.refresh(db_vehiculo)
     
@@ -370,7 +406,9 @@ def delete_vehiculo(placa: str, session: Session = Depends(get_session)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehículo no encontrado o ya inactivo.")
 
     vehiculo.estado = False # Soft Delete
+    vehiculo.fecha_baja = datetime.utcnow()
     session.add(vehiculo)
+    registrar_vehiculo(session, "eliminar", vehiculo)
     session.commit()
     
     return {"message": f"Vehículo con placa {placa} ha sido marcado como inactivo."}
@@ -395,6 +433,7 @@ def create_ficha_tecnica(ficha: FichaTecnicaCreate, session: Session = Depends(g
 
     db_ficha = FichaTecnica.model_validate(ficha)
     session.add(db_ficha)
+    registrar_ficha_tecnica(session, "crear", db_ficha)
     session.commit()
     session.refresh(db_ficha)
     return db_ficha
@@ -409,9 +448,10 @@ def update_ficha_tecnica(placa: str, ficha_update: FichaTecnicaUpdate, session:
 
     # Aplicar la actualización parcial
     update_data = ficha_update.model_dump(exclude_unset=True)
-    ficha.model_validate(update_data, update=True)
+    ficha.sqlmodel_update(update_data)
     
     session.add(ficha)
+    registrar_ficha_tecnica(session, "actualizar", ficha)
     session.commit()
     session.refresh(ficha)
     return ficha
@@ -473,6 +513,7 @@ async def create_compra_from_form(
         
     #Almacenar en la DB
     session.add(db_compra)
+    registrar_compra(session, "crear", db_compra)
     session.commit()
     session.refresh(db_compra)
     
@@ -514,6 +555,7 @@ def create_compra(compra: CompraCreate, session: Session = Depends(get_session))
 
     db_compra = Compra.model_validate(compra)
     session.add(db_compra)
+    registrar_compra(session, "crear", db_compra)
     session.commit()
     session.refresh(db_compra)
     return db_compra
@@ -534,6 +576,132 @@ def read_compra(compra_id: int, session: Session = Depends(get_session)):
     return compra
 
 
+# 7. FEED DE CAMBIOS EN VIVO (Deltas por offset, SSE y WebSocket)
+# Intervalo máximo sin eventos antes de enviar un latido al cliente
+LATIDO_SEGUNDOS = 15.0
+
+def _evento_reinicio() -> dict:
+    # Se envía cuando el offset pedido ya salió del historial o el cliente se atrasó:
+    # el cliente debe recargar /vehiculos/ y /compras/ y continuar desde 'offset'.
+    return {"offset": difusor.ultimo_offset, "entidad": "feed", "accion": "reiniciar"}
+
+@app.get("/cambios/", tags=["Cambios"])
+def read_cambios(desde: int = Query(0, ge=0, description="Último offset recibido por el cliente")):
+    """
+    Devuelve los cambios posteriores a 'desde' sin abrir un stream.
+    Si 'completo' es False el historial ya no alcanza y el cliente debe recargar todo.
+    """
+    eventos, completo = difusor.eventos_desde(desde)
+    return {"ultimo_offset": difusor.ultimo_offset, "completo": completo, "eventos": eventos}
+
+@app.get("/cambios/stream", tags=["Cambios"])
+async def stream_cambios(
+    request: Request,
+    desde: Optional[int] = Query(None, ge=0, description="Offset desde el cual reanudar"),
+):
+    """
+    Feed de cambios por Server-Sent Events. Cada evento lleva su offset como 'id',
+    de modo que el navegador reanuda solo con la cabecera Last-Event-ID.
+    """
+    ultimo_id = request.headers.get("last-event-id")
+    if desde is None and ultimo_id and ultimo_id.isdigit():
+        desde = int(ultimo_id)
+
+    async def generar():
+        suscriptor, atrasados, completo = difusor.suscribir(desde)
+        try:
+            if not completo:
+                atrasados = [_evento_reinicio()]
+            for evento in atrasados:
+                yield f"id: {evento['offset']}\ndata: {json.dumps(evento)}\n\n"
+            while not await request.is_disconnected():
+                eventos = await suscriptor.esperar(LATIDO_SEGUNDOS)
+                if suscriptor.desbordado:
+                    evento = _evento_reinicio()
+                    yield f"id: {evento['offset']}\ndata: {json.dumps(evento)}\n\n"
+                    break
+                if not eventos:
+                    yield ": latido\n\n"
+                for evento in eventos:
+                    yield f"id: {evento['offset']}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            difusor.desuscribir(suscriptor)
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/cambios/ws")
+async def websocket_cambios(websocket: WebSocket, desde: Optional[int] = None):
+    """Feed de cambios por WebSocket. El cliente reanuda con ?desde=<último offset>."""
+    await websocket.accept()
+    suscriptor, atrasados, completo = difusor.suscribir(desde)
+    try:
+        if not completo:
+            atrasados = [_evento_reinicio()]
+        for evento in atrasados:
+            await websocket.send_json(evento)
+        while True:
+            eventos = await suscriptor.esperar(LATIDO_SEGUNDOS)
+            if suscriptor.desbordado:
+                await websocket.send_json(_evento_reinicio())
+                await websocket.close()
+                break
+            if not eventos:
+                await websocket.send_json({"offset": difusor.ultimo_offset, "entidad": "feed", "accion": "latido"})
+            for evento in eventos:
+                await websocket.send_json(evento)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        difusor.desuscribir(suscriptor)
+
+
+# 8. MANTENIMIENTO (Retención de filas inactivas y compactación)
+@app.post("/mantenimiento/retencion", tags=["Mantenimiento"])
+def run_retencion(dias: int = Query(RETENCION_DIAS, ge=0, description="Días desde la baja para archivar un registro")):
+    """
+    Archiva Vehículos/Usuarios inactivos (y sus Compras antiguas), compacta la DB
+    y devuelve el reporte de tamaños y latencias antes/después.
+    """
+    try:
+        return retencion.ejecutar(dias)
+    except RetencionEnCursoError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@app.get("/mantenimiento/retencion", tags=["Mantenimiento"])
+def read_retencion():
+    """Devuelve el reporte de la última ejecución de retención (de cualquier worker)."""
+    reporte = retencion.ultimo_reporte()
+    if reporte is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="La retención aún no se ha ejecutado.")
+    return reporte
+
+@app.post("/mantenimiento/restaurar/vehiculos/{placa}", tags=["Mantenimiento"])
+def restaurar_vehiculo(placa: str):
+    """Restaura y reactiva un Vehículo archivado con su Ficha Técnica y Compras."""
+    try:
+        restaurados = retencion.restaurar_vehiculo(placa)
+    except NoArchivadoError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RestauracionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"message": f"Vehículo con placa {placa} restaurado desde el archivo.", "restaurados": restaurados}
+
+@app.post("/mantenimiento/restaurar/usuarios/{cedula}", tags=["Mantenimiento"])
+def restaurar_usuario(cedula: str):
+    """Restaura y reactiva un Usuario archivado con sus Compras."""
+    try:
+        restaurados = retencion.restaurar_usuario(cedula)
+    except NoArchivadoError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RestauracionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"message": f"Usuario con cédula {cedula} restaurado desde el archivo.", "restaurados": restaurados}
+
+
 #ENDPOINT RAIZ
 @app.get("/", tags=["Root"])
 def read_root():
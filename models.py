@@ -28,6 +28,7 @@ class UsuarioBase(SQLModel):
 class Usuario(UsuarioBase, table=True):
     estado: bool = Field(default=True, description="True=activo, False=inactivo (soft delete)")
     fecha_registro: datetime = Field(default_factory=datetime.utcnow)
+    fecha_baja: Optional[datetime] = Field(default=None, description="Momento del soft delete (retención)")
     
     # RELACIONES
     # 1:N con Compra (un usuario puede tener muchas compras/ventas)
@@ -49,6 +50,7 @@ class VehiculoBase(SQLModel):
 class Vehiculo(VehiculoBase, table=True):
     estado: bool = Field(default=True, description="True=activo, False=inactivo (soft delete)")
     fecha_registro: datetime = Field(default_factory=datetime.utcnow)
+    fecha_baja: Optional[datetime] = Field(default=None, description="Momento del soft delete (retención)")
     
     # RELACIONES
     # 1:1 con FichaTecnica (Un vehículo tiene exactamente una ficha técnica)
@@ -90,6 +92,9 @@ class CompraBase(SQLModel):
     fecha_compra: datetime = Field(default_factory=datetime.utcnow)
 
 class Compra(CompraBase, table=True):
+    # AUTOINCREMENT: los IDs de compras archivadas no se reutilizan (exportaciones incrementales)
+    __table_args__ = {"sqlite_autoincrement": True}
+
     # ID Propio para la transacción (PK)
     id: Optional[int] = Field(default=None, primary_key=True)
     estado: str = Field(default="Completada", description="Estado de la transacción (Completada, Cancelada, Pendiente)")
@@ -167,4 +172,40 @@ class FichaTecnicaUpdate(FichaTecnicaBase):
 class CompraUpdate(SQLModel):
     precio_final: Optional[float] = None
     tipo_pago: Optional[str] = None
-    estado: Optional[str] = None
\ No newline at end of file
+    estado: Optional[str] = None
+
+# ==================================================
+# 5. MODELO CAMBIO (Versión de datos compartida entre workers)
+# ==================================================
+class Cambio(SQLModel, table=True):
+    """
+    Registro de cambios escrito en la MISMA transacción que el cambio de negocio.
+    Su ID es la versión global de los datos: todos los workers leen este log
+    para invalidar/refrescar su estado en memoria y servir el feed de cambios.
+    """
+    # AUTOINCREMENT evita que SQLite reutilice IDs (las versiones nunca retroceden)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entidad: str = Field(description="usuario, vehiculo, ficha_tecnica o compra")
+    accion: str = Field(description="crear, actualizar o eliminar")
+    clave: str = Field(description="PK de la fila modificada (Placa o ID de compra)")
+    datos: str = Field(default="{}", description="JSON compacto con los campos del cambio")
+    fecha: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ==================================================
+# 6. MODELOS DE MANTENIMIENTO (Retención compartida entre workers)
+# ==================================================
+class TurnoMantenimiento(SQLModel, table=True):
+    """Turno (lease) que elige a un único worker para una tarea de mantenimiento."""
+    nombre: str = Field(primary_key=True)
+    dueno: str = Field(description="host:pid del worker que tiene el turno")
+    vence: datetime = Field(description="Si el worker muere, otro puede tomar el turno al vencer")
+
+
+class ReporteRetencion(SQLModel, table=True):
+    """Reporte de cada ejecución de retención, visible desde cualquier worker."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fecha: datetime = Field(default_factory=datetime.utcnow, index=True)
+    datos: str = Field(description="JSON con archivados, tamaños y latencias antes/después")
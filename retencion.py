@@ -0,0 +1,518 @@
+"""
+retencion.py
+
+Retención y compactación de filas con Soft Delete:
+- Mueve a una DB de archivo (ATTACH) los Vehículos y Usuarios inactivos con más
+  de RETENCION_DIAS desde su baja (fecha_baja), junto con sus Compras antiguas, y las
+  Fichas Técnicas huérfanas o de vehículos archivados. Las tablas de archivo
+  tienen llave propia (archivo_id): archivar nunca reemplaza filas ya archivadas.
+- Un vehículo/usuario con compras recientes se conserva hasta que todas envejezcan.
+- Compacta el log de Cambio antiguo (conservando el historial del feed).
+- Ejecuta VACUUM incremental y ANALYZE, y reporta tamaños por tabla/índice (dbstat)
+  y latencia de consultas antes y después.
+- Permite restaurar un Vehículo o Usuario archivado: vuelve activo y sin fecha_baja,
+  así la siguiente ejecución no lo archiva de nuevo.
+- Con varios workers, solo el que toma el turno (TurnoMantenimiento) ejecuta la
+  retención, y el reporte se guarda en la DB (ReporteRetencion).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from database import SQLITE_FILE_NAME
+from eventos import HISTORIAL_MAXIMO
+from models import Cambio, Compra, FichaTecnica, ReporteRetencion, TurnoMantenimiento, Usuario, Vehiculo
+
+# CONFIGURACIÓN DE LA RETENCIÓN
+ARCHIVO_FILE_NAME = "autoseguro360_archivo.db"
+RETENCION_DIAS = 180
+INTERVALO_HORAS = 24
+# Cada cuánto revisa cada worker si ya toca ejecutar
+REVISION_SEGUNDOS = 300
+# Duración del turno: si el worker que lo tiene muere, otro lo toma al vencer
+DURACION_TURNO = timedelta(hours=1)
+REPORTES_CONSERVADOS = 100
+# Páginas libres a devolver al sistema por ejecución (VACUUM incremental)
+PAGINAS_VACUUM = 2000
+
+T_USUARIO = Usuario.__tablename__
+T_VEHICULO = Vehiculo.__tablename__
+T_FICHA = FichaTecnica.__tablename__
+T_COMPRA = Compra.__tablename__
+T_CAMBIO = Cambio.__tablename__
+T_TURNO = TurnoMantenimiento.__tablename__
+T_REPORTE = ReporteRetencion.__tablename__
+TURNO_RETENCION = "retencion"
+TABLAS_ARCHIVABLES = (T_USUARIO, T_VEHICULO, T_FICHA, T_COMPRA)
+# Clave de negocio de cada tabla (PK en la DB principal, índice en el archivo)
+CLAVES = {T_USUARIO: "cedula", T_VEHICULO: "placa", T_FICHA: "vehiculo_placa", T_COMPRA: "id"}
+
+# Consultas del camino de lectura cuya latencia se reporta antes/después
+CONSULTAS_MEDIDAS = {
+    "catalogo_activo": f"SELECT * FROM main.{T_VEHICULO} WHERE estado = 1",
+    "compras": f"SELECT * FROM main.{T_COMPRA}",
+}
+
+
+class RestauracionError(Exception):
+    """El registro ya existe en la DB principal y no se puede restaurar."""
+
+
+class NoArchivadoError(RestauracionError):
+    """El registro no está en la DB de archivo."""
+
+
+class RetencionEnCursoError(Exception):
+    """Otro worker tiene el turno de retención."""
+
+
+def _fecha_sql(fecha: datetime) -> str:
+    # Mismo formato en que SQLAlchemy guarda los DATETIME en SQLite
+    return fecha.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _columnas(conexion: sqlite3.Connection, esquema: str, tabla: str) -> list:
+    return [fila[1] for fila in conexion.execute(f"PRAGMA {esquema}.table_info({tabla})")]
+
+
+def crear_tablas_archivo(conexion: sqlite3.Connection) -> None:
+    """
+    Crea en la DB adjunta 'archivo' una tabla por cada tabla archivable, con las
+    mismas columnas y una llave propia (archivo_id). Sin PK ni UNIQUE de negocio:
+    una placa o cédula que se registra de nuevo y se vuelve a archivar, o una
+    compra con ID reutilizado, se guarda como otra fila y nunca reemplaza a la anterior.
+    """
+    for tabla in TABLAS_ARCHIVABLES:
+        info = conexion.execute(f"PRAGMA main.table_info({tabla})").fetchall()
+        if not info:
+            continue
+        existentes = _columnas(conexion, "archivo", tabla)
+        if "archivo_id" not in existentes:
+            if existentes:
+                # Archivo de la versión anterior (misma PK que la DB principal)
+                conexion.execute(f"ALTER TABLE archivo.{tabla} RENAME TO {tabla}_v1")
+            definicion = ", ".join(f"{fila[1]} {fila[2]}" for fila in info)
+            conexion.execute(
+                f"CREATE TABLE archivo.{tabla} ("
+                f"archivo_id INTEGER PRIMARY KEY AUTOINCREMENT, archivado_en DATETIME, {definicion})"
+            )
+            conexion.execute(f"CREATE INDEX archivo.ix_{tabla}_{CLAVES[tabla]} ON {tabla} ({CLAVES[tabla]})")
+            if existentes:
+                nombres = ", ".join(existentes)
+                conexion.execute(f"INSERT INTO archivo.{tabla} ({nombres}) SELECT {nombres} FROM archivo.{tabla}_v1")
+                conexion.execute(f"DROP TABLE archivo.{tabla}_v1")
+            existentes = _columnas(conexion, "archivo", tabla)
+        # Columnas agregadas después a la tabla principal
+        for fila in info:
+            if fila[1] not in existentes:
+                conexion.execute(f"ALTER TABLE archivo.{tabla} ADD COLUMN {fila[1]} {fila[2]}")
+
+
+def _reservar_ids_archivados(conexion: sqlite3.Connection) -> None:
+    # La secuencia de Compra nunca debe quedar por debajo de un ID ya archivado
+    if not conexion.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        return
+    maximo = conexion.execute(f"SELECT MAX(id) FROM archivo.{T_COMPRA}").fetchone()[0]
+    if maximo is None:
+        return
+    fila = conexion.execute("SELECT seq FROM main.sqlite_sequence WHERE name = ?", (T_COMPRA,)).fetchone()
+    if fila is None:
+        conexion.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)", (T_COMPRA, maximo))
+    elif fila[0] < maximo:
+        conexion.execute("UPDATE main.sqlite_sequence SET seq = ? WHERE name = ?", (maximo, T_COMPRA))
+
+
+class Retencion:
+    """Operaciones de archivo, restauración y compactación sobre la DB SQLite."""
+
+    def __init__(self, db_path: str = SQLITE_FILE_NAME, archivo_path: str = ARCHIVO_FILE_NAME):
+        self.db_path = db_path
+        self.archivo_path = archivo_path
+        self.dueno = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+    # ------------------ Conexión y esquema ------------------
+    def _conectar(self) -> sqlite3.Connection:
+        # isolation_level=None: las transacciones se controlan con BEGIN IMMEDIATE
+        conexion = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        conexion.execute("ATTACH DATABASE ? AS archivo", (self.archivo_path,))
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            crear_tablas_archivo(conexion)
+            _reservar_ids_archivados(conexion)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            conexion.close()
+            raise
+        return conexion
+
+    def preparar(self) -> None:
+        """Crea/migra las tablas de archivo y reserva los IDs de compras archivadas."""
+        self._conectar().close()
+
+    def _registrar_cambios(self, conexion: sqlite3.Connection, entidad: str, accion: str, tabla_claves: str) -> None:
+        # Log de Cambio para que los demás workers invaliden su estado (ver coherencia.py)
+        conexion.execute(
+            f"INSERT INTO main.{T_CAMBIO} (entidad, accion, clave, datos, fecha) "
+            f"SELECT ?, ?, clave, '{{}}', ? FROM {tabla_claves}",
+            (entidad, accion, _fecha_sql(datetime.utcnow())),
+        )
+
+    # ------------------ Métricas ------------------
+    def _medir(self, conexion: sqlite3.Connection) -> Dict[str, Any]:
+        tamano_pagina = conexion.execute("PRAGMA main.page_size").fetchone()[0]
+        paginas = conexion.execute("PRAGMA main.page_count").fetchone()[0]
+        libres = conexion.execute("PRAGMA main.freelist_count").fetchone()[0]
+        filas = {
+            tabla: conexion.execute(f"SELECT COUNT(*) FROM main.{tabla}").fetchone()[0]
+            for tabla in TABLAS_ARCHIVABLES + (T_CAMBIO,)
+        }
+        try:
+            # Bytes por tabla e índice (sqlite_autoindex_* son los índices de PK/UNIQUE)
+            bytes_tablas = dict(conexion.execute(
+                "SELECT name, SUM(pgsize) FROM dbstat('main') GROUP BY name ORDER BY name"
+            ).fetchall())
+        except sqlite3.OperationalError:
+            # SQLite compilado sin SQLITE_ENABLE_DBSTAT_VTAB
+            bytes_tablas = None
+        latencias = {}
+        for nombre, consulta in CONSULTAS_MEDIDAS.items():
+            tiempos = []
+            for _ in range(5):
+                inicio = time.perf_counter()
+                conexion.execute(consulta).fetchall()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            latencias[nombre] = round(statistics.median(tiempos), 3)
+        bytes_db = tamano_pagina * paginas
+        return {
+            "bytes_db": bytes_db,
+            "bytes_tablas": bytes_tablas,
+            # Páginas libres + páginas de control (p. ej. el pointer-map de auto_vacuum)
+            "bytes_otros": None if bytes_tablas is None else bytes_db - sum(bytes_tablas.values()),
+            "paginas_libres": libres,
+            "filas": filas,
+            "latencia_ms": latencias,
+        }
+
+    # ------------------ Archivo ------------------
+    def _archivar(self, conexion: sqlite3.Connection, corte: str) -> Dict[str, int]:
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            # Sin fecha_baja (baja anterior al registro de la fecha) no se sabe su edad: no se archiva
+            for tabla, entidad, clave, columna_compra in (
+                (T_VEHICULO, "vehiculo", "placa", "vehiculo_placa"),
+                (T_USUARIO, "usuario", "cedula", "comprador_cedula"),
+            ):
+                conexion.execute(f"DROP TABLE IF EXISTS temp._archivar_{entidad}")
+                conexion.execute(
+                    f"""CREATE TEMP TABLE _archivar_{entidad} AS
+                    SELECT t.{clave} AS clave FROM main.{tabla} t
+                    WHERE t.estado = 0
+                      AND t.fecha_baja IS NOT NULL
+                      AND t.fecha_baja < ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM main.{T_COMPRA} co
+                          WHERE co.{columna_compra} = t.{clave} AND co.fecha_compra >= ?)""",
+                    (corte, corte),
+                )
+
+            conexion.execute("DROP TABLE IF EXISTS temp._archivar_compra")
+            conexion.execute(
+                f"""CREATE TEMP TABLE _archivar_compra AS
+                SELECT id AS clave FROM main.{T_COMPRA}
+                WHERE vehiculo_placa IN (SELECT clave FROM temp._archivar_vehiculo)
+                   OR comprador_cedula IN (SELECT clave FROM temp._archivar_usuario)"""
+            )
+            conexion.execute("DROP TABLE IF EXISTS temp._archivar_ficha")
+            conexion.execute(
+                f"""CREATE TEMP TABLE _archivar_ficha AS
+                SELECT vehiculo_placa AS clave FROM main.{T_FICHA}
+                WHERE vehiculo_placa IN (SELECT clave FROM temp._archivar_vehiculo)
+                   OR vehiculo_placa NOT IN (SELECT placa FROM main.{T_VEHICULO})"""
+            )
+
+            movidos = {}
+            ahora = _fecha_sql(datetime.utcnow())
+            for tabla, temporal in (
+                (T_COMPRA, "_archivar_compra"),
+                (T_FICHA, "_archivar_ficha"),
+                (T_VEHICULO, "_archivar_vehiculo"),
+                (T_USUARIO, "_archivar_usuario"),
+            ):
+                clave = CLAVES[tabla]
+                columnas = ", ".join(_columnas(conexion, "main", tabla))
+                # INSERT simple: el archivo tiene llave propia, nunca reemplaza filas archivadas
+                conexion.execute(
+                    f"INSERT INTO archivo.{tabla} (archivado_en, {columnas}) "
+                    f"SELECT ?, {columnas} FROM main.{tabla} WHERE {clave} IN (SELECT clave FROM temp.{temporal})",
+                    (ahora,),
+                )
+                cursor = conexion.execute(f"DELETE FROM main.{tabla} WHERE {clave} IN (SELECT clave FROM temp.{temporal})")
+                movidos[tabla] = cursor.rowcount
+
+            for entidad in ("vehiculo", "usuario", "compra"):
+                self._registrar_cambios(conexion, entidad, "archivar", f"temp._archivar_{entidad}")
+
+            # Compactación del log de cambios: se conserva el historial que usa el feed
+            cursor = conexion.execute(
+                f"DELETE FROM main.{T_CAMBIO} WHERE fecha < ? "
+                f"AND id <= (SELECT MAX(id) FROM main.{T_CAMBIO}) - ?",
+                (corte, HISTORIAL_MAXIMO),
+            )
+            movidos[T_CAMBIO] = cursor.rowcount
+            _reservar_ids_archivados(conexion)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        return movidos
+
+    def _compactar(self, conexion: sqlite3.Connection) -> str:
+        # auto_vacuum=INCREMENTAL solo se activa con un VACUUM completo (una única vez)
+        if conexion.execute("PRAGMA main.auto_vacuum").fetchone()[0] != 2:
+            conexion.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+            conexion.execute("VACUUM main")
+            modo = "vacuum_completo"
+        else:
+            # execute() solo avanza un paso del pragma (libera una página); executescript lo agota
+            conexion.executescript(f"PRAGMA main.incremental_vacuum({PAGINAS_VACUUM})")
+            modo = "vacuum_incremental"
+        conexion.execute("ANALYZE main")
+        return modo
+
+    # ------------------ Turno y reportes ------------------
+    def _tomar_turno(self, conexion: sqlite3.Connection, pendiente_desde: Optional[str]) -> bool:
+        """
+        Toma el turno si está libre o vencido. Con 'pendiente_desde' solo lo toma si
+        no hay un reporte posterior a esa fecha (otro worker ya hizo la ejecución).
+        """
+        ahora = datetime.utcnow()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conexion.execute(
+                f"SELECT dueno, vence FROM main.{T_TURNO} WHERE nombre = ?", (TURNO_RETENCION,)
+            ).fetchone()
+            ocupado = fila is not None and fila[0] != self.dueno and fila[1] >= _fecha_sql(ahora)
+            hecho = pendiente_desde is not None and conexion.execute(
+                f"SELECT 1 FROM main.{T_REPORTE} WHERE fecha >= ?", (pendiente_desde,)
+            ).fetchone() is not None
+            if ocupado or hecho:
+                conexion.execute("ROLLBACK")
+                return False
+            conexion.execute(
+                f"INSERT OR REPLACE INTO main.{T_TURNO} (nombre, dueno, vence) VALUES (?, ?, ?)",
+                (TURNO_RETENCION, self.dueno, _fecha_sql(ahora + DURACION_TURNO)),
+            )
+            conexion.execute("COMMIT")
+            return True
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def _liberar_turno(self, conexion: sqlite3.Connection, reporte: Optional[Dict[str, Any]] = None) -> None:
+        # El reporte se guarda en la misma transacción que libera el turno
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            if reporte is not None:
+                conexion.execute(
+                    f"INSERT INTO main.{T_REPORTE} (fecha, datos) VALUES (?, ?)",
+                    (_fecha_sql(datetime.utcnow()), json.dumps(reporte)),
+                )
+                conexion.execute(
+                    f"DELETE FROM main.{T_REPORTE} WHERE id <= (SELECT MAX(id) FROM main.{T_REPORTE}) - ?",
+                    (REPORTES_CONSERVADOS,),
+                )
+            conexion.execute(
+                f"DELETE FROM main.{T_TURNO} WHERE nombre = ? AND dueno = ?", (TURNO_RETENCION, self.dueno)
+            )
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def ultimo_reporte(self) -> Optional[Dict[str, Any]]:
+        """Reporte de la última ejecución, sin importar qué worker la hizo."""
+        conexion = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            fila = conexion.execute(f"SELECT datos FROM {T_REPORTE} ORDER BY id DESC LIMIT 1").fetchone()
+        finally:
+            conexion.close()
+        return json.loads(fila[0]) if fila else None
+
+    # ------------------ Ejecución ------------------
+    def _ejecutar_con_turno(self, conexion: sqlite3.Connection, dias: int) -> Dict[str, Any]:
+        corte = _fecha_sql(datetime.utcnow() - timedelta(days=dias))
+        antes = self._medir(conexion)
+        inicio = time.perf_counter()
+        movidos = self._archivar(conexion, corte)
+        try:
+            compactacion = self._compactar(conexion)
+        except sqlite3.OperationalError as e:
+            # DB ocupada por escrituras de la API: se reintenta en la próxima ejecución
+            compactacion = f"omitida: {e}"
+        despues = self._medir(conexion)
+        return {
+            "fecha": datetime.utcnow().isoformat(),
+            "worker": self.dueno,
+            "retencion_dias": dias,
+            "duracion_s": round(time.perf_counter() - inicio, 3),
+            "archivados": movidos,
+            "compactacion": compactacion,
+            "antes": antes,
+            "despues": despues,
+        }
+
+    def ejecutar(self, dias: int = RETENCION_DIAS, pendiente_desde: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Archiva, compacta y devuelve el reporte de tamaños y latencias antes/después.
+        Lanza RetencionEnCursoError si otro worker tiene el turno. Con 'pendiente_desde'
+        (uso del programador) devuelve None si no toca ejecutar.
+        """
+        with self._lock:
+            conexion = self._conectar()
+            try:
+                if not self._tomar_turno(conexion, pendiente_desde):
+                    if pendiente_desde is not None:
+                        return None
+                    raise RetencionEnCursoError("Otro worker está ejecutando la retención.")
+                try:
+                    reporte = self._ejecutar_con_turno(conexion, dias)
+                except Exception:
+                    self._liberar_turno(conexion)
+                    raise
+                self._liberar_turno(conexion, reporte)
+            finally:
+                conexion.close()
+
+            antes, despues = reporte["antes"], reporte["despues"]
+            print(f"--- RETENCIÓN: {reporte['archivados']} | "
+                  f"bytes {antes['bytes_db']} -> {despues['bytes_db']} | "
+                  f"latencia {antes['latencia_ms']} -> {despues['latencia_ms']} ---")
+            return reporte
+
+    # ------------------ Restauración ------------------
+    def _mover_a_principal(self, conexion: sqlite3.Connection, tabla: str, filtro: str, parametros: tuple) -> int:
+        # Copia a la DB principal las filas archivadas que cumplen el filtro y las borra del archivo
+        columnas = ", ".join(_columnas(conexion, "main", tabla))
+        ids = [fila[0] for fila in conexion.execute(f"SELECT archivo_id FROM archivo.{tabla} WHERE {filtro}", parametros)]
+        if not ids:
+            return 0
+        marcadores = ", ".join("?" for _ in ids)
+        conexion.execute(
+            f"INSERT INTO main.{tabla} ({columnas}) SELECT {columnas} FROM archivo.{tabla} WHERE archivo_id IN ({marcadores})",
+            ids,
+        )
+        conexion.execute(f"DELETE FROM archivo.{tabla} WHERE archivo_id IN ({marcadores})", ids)
+        return len(ids)
+
+    def _mover_restaurados(self, conexion: sqlite3.Connection, tabla: str, valor: str, condicion_compras: str) -> Dict[str, int]:
+        clave = CLAVES[tabla]
+        # Si se archivó varias veces, vuelve la versión archivada más reciente
+        ultima = f"archivo_id = (SELECT MAX(archivo_id) FROM archivo.{tabla} WHERE {clave} = ?)"
+        restaurados = {tabla: self._mover_a_principal(conexion, tabla, ultima, (valor,))}
+        # Restaurar es reactivar: con estado=0 y la fecha_baja vieja se volvería a archivar
+        conexion.execute(f"UPDATE main.{tabla} SET estado = 1, fecha_baja = NULL WHERE {clave} = ?", (valor,))
+        if tabla == T_VEHICULO:
+            restaurados[T_FICHA] = 0
+            # Si la DB principal ya tiene una ficha para la placa, se conserva esa
+            if not conexion.execute(f"SELECT 1 FROM main.{T_FICHA} WHERE vehiculo_placa = ?", (valor,)).fetchone():
+                restaurados[T_FICHA] = self._mover_a_principal(
+                    conexion, T_FICHA,
+                    f"archivo_id = (SELECT MAX(archivo_id) FROM archivo.{T_FICHA} WHERE vehiculo_placa = ?)",
+                    (valor,),
+                )
+        # Solo vuelven las compras cuya otra parte también está en la DB principal
+        restaurados[T_COMPRA] = self._mover_a_principal(conexion, T_COMPRA, condicion_compras, (valor,))
+        return restaurados
+
+    def _restaurar(self, tabla: str, valor: str, entidad: str, condicion_compras: str) -> Dict[str, int]:
+        clave = CLAVES[tabla]
+        conexion = self._conectar()
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                if not conexion.execute(f"SELECT 1 FROM archivo.{tabla} WHERE {clave} = ?", (valor,)).fetchone():
+                    raise NoArchivadoError(f"{entidad} {valor} no está en el archivo.")
+                if conexion.execute(f"SELECT 1 FROM main.{tabla} WHERE {clave} = ?", (valor,)).fetchone():
+                    raise RestauracionError(f"{entidad} {valor} ya existe en la base de datos principal.")
+
+                try:
+                    restaurados = self._mover_restaurados(conexion, tabla, valor, condicion_compras)
+                except sqlite3.IntegrityError as e:
+                    # UNIQUE ocupado desde el archivo (p. ej. el email ya lo usa otro usuario)
+                    # o compras archivadas antes de AUTOINCREMENT cuyo ID ya fue reutilizado
+                    raise RestauracionError(f"No se puede restaurar {entidad} {valor}: {e}")
+
+                conexion.execute(
+                    f"INSERT INTO main.{T_CAMBIO} (entidad, accion, clave, datos, fecha) VALUES (?, 'restaurar', ?, '{{}}', ?)",
+                    (entidad, valor, _fecha_sql(datetime.utcnow())),
+                )
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+        finally:
+            conexion.close()
+        return restaurados
+
+    def restaurar_vehiculo(self, placa: str) -> Dict[str, int]:
+        """Devuelve a la DB principal (activo) un Vehículo archivado, su Ficha Técnica y sus Compras."""
+        with self._lock:
+            return self._restaurar(
+                T_VEHICULO, placa, "vehiculo",
+                f"vehiculo_placa = ? AND comprador_cedula IN (SELECT cedula FROM main.{T_USUARIO})",
+            )
+
+    def restaurar_usuario(self, cedula: str) -> Dict[str, int]:
+        """Devuelve a la DB principal (activo) un Usuario archivado y sus Compras."""
+        with self._lock:
+            return self._restaurar(
+                T_USUARIO, cedula, "usuario",
+                f"comprador_cedula = ? AND vehiculo_placa IN (SELECT placa FROM main.{T_VEHICULO})",
+            )
+
+
+# ==================================================
+# PROGRAMADOR (Ejecución periódica en segundo plano)
+# ==================================================
+class ProgramadorRetencion:
+    """
+    Hilo que revisa cada REVISION_SEGUNDOS si ya pasaron INTERVALO_HORAS desde el
+    último reporte guardado; el turno en la DB garantiza que un solo worker ejecuta.
+    """
+
+    def __init__(self, retencion: Retencion, intervalo_horas: float = INTERVALO_HORAS):
+        self.retencion = retencion
+        self.intervalo = timedelta(hours=intervalo_horas)
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self) -> None:
+        self.retencion.preparar()
+        self._hilo = threading.Thread(target=self._bucle, name="retencion", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+
+    def _bucle(self) -> None:
+        while not self._detener.wait(REVISION_SEGUNDOS):
+            try:
+                self.retencion.ejecutar(pendiente_desde=_fecha_sql(datetime.utcnow() - self.intervalo))
+            except sqlite3.Error as e:
+                print(f"ERROR RETENCIÓN: {e}")
+
+
+# INSTANCIAS USADAS POR LA APLICACIÓN
+retencion = Retencion()
+programador_retencion = ProgramadorRetencion(retencion)
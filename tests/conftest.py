@@ -0,0 +1,94 @@
+"""Fixtures compartidas: cada prueba trabaja sobre una DB SQLite temporal."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from database import migrar_esquema  # noqa: E402
+from eventos import Difusor  # noqa: E402
+from models import Compra, FichaTecnica, Usuario, Vehiculo  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    ruta = str(tmp_path / "prueba.db")
+    engine = create_engine(f"sqlite:///{ruta}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    migrar_esquema(ruta)
+    return ruta
+
+
+@pytest.fixture
+def archivo_path(tmp_path):
+    return str(tmp_path / "archivo.db")
+
+
+@pytest.fixture
+def session(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def cliente(db_path, monkeypatch):
+    """TestClient de la API sobre la DB temporal y con un difusor propio (sin startup)."""
+    from fastapi.testclient import TestClient
+
+    # main.py monta static/ y templates/ con rutas relativas a la raíz del proyecto
+    monkeypatch.chdir(RAIZ)
+    import database
+    import main
+
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    def get_session_prueba():
+        with Session(engine) as session:
+            yield session
+
+    main.app.dependency_overrides[database.get_session] = get_session_prueba
+    monkeypatch.setattr(main, "difusor", Difusor())
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def crear_usuario(session, cedula, activo=True):
+    usuario = Usuario(cedula=cedula, nombres_completo=f"Usuario {cedula}", celular="300",
+                      email=f"{cedula}@correo.com", edad=30, estado=activo)
+    session.add(usuario)
+    session.commit()
+    return usuario
+
+
+def crear_vehiculo(session, placa, marca="KIA", activo=True, con_ficha=False):
+    vehiculo = Vehiculo(placa=placa, marca=marca, linea="Picanto", modelo=2020, precio=1000.0, estado=activo)
+    session.add(vehiculo)
+    if con_ficha:
+        session.add(FichaTecnica(vehiculo_placa=placa, color="rojo"))
+    session.commit()
+    return vehiculo
+
+
+def dar_de_baja(session, entidad, hace_dias=0):
+    entidad.estado = False
+    entidad.fecha_baja = datetime.utcnow() - timedelta(days=hace_dias)
+    session.add(entidad)
+    session.commit()
+
+
+def crear_compra(session, cedula, placa, precio, fecha=None):
+    compra = Compra(comprador_cedula=cedula, vehiculo_placa=placa, precio_final=precio,
+                    fecha_compra=fecha or datetime.utcnow())
+    session.add(compra)
+    session.commit()
+    session.refresh(compra)
+    return compra
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from coherencia import VigilanteCambios
+from conftest import crear_usuario, crear_vehiculo
+
+
+def _eventos(db_path):
+    # Lee los cambios confirmados tal como los recibe el feed de cualquier worker
+    eventos = []
+    vigilante = VigilanteCambios(db_path, intervalo=3600)
+    vigilante.registrar_oyente(eventos.append)
+    vigilante.iniciar()
+    vigilante.detener()
+    return eventos
+
+
+def test_patch_ficha_tecnica_publica_actualizar_con_los_datos_nuevos(cliente, session, db_path):
+    crear_vehiculo(session, "AAA111", con_ficha=True)
+
+    respuesta = cliente.patch("/fichas_tecnicas/AAA111", json={"color": "azul", "cilindraje": 1200})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["color"] == "azul"
+    evento = _eventos(db_path)[-1]
+    assert (evento["entidad"], evento["accion"], evento["clave"]) == ("ficha_tecnica", "actualizar", "AAA111")
+    assert evento["datos"]["color"] == "azul"
+    assert evento["datos"]["cilindraje"] == 1200
+
+
+def test_evento_de_compra_usa_fechas_iso(cliente, session, db_path):
+    crear_usuario(session, "1")
+    crear_vehiculo(session, "AAA111")
+
+    respuesta = cliente.post("/compras/", data={
+        "comprador_cedula": "1", "vehiculo_placa": "AAA111", "precio_final": 1.0, "tipo_pago": "Efectivo",
+    })
+
+    assert respuesta.status_code == 201
+    evento = _eventos(db_path)[-1]
+    assert evento["entidad"] == "compra"
+    assert datetime.fromisoformat(evento["datos"]["fecha_compra"]).isoformat() == evento["datos"]["fecha_compra"]
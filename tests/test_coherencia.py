@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from coherencia import VigilanteCambios
+
+
+def _insertar_cambios(db_path, *claves):
+    # Otra conexión (otro worker) confirma cambios sobre la misma DB
+    conexion = sqlite3.connect(db_path)
+    conexion.executemany(
+        "INSERT INTO cambio (entidad, accion, clave, datos, fecha) "
+        "VALUES ('vehiculo', 'crear', ?, '{}', '2026-01-01 00:00:00.000000')",
+        [(clave,) for clave in claves],
+    )
+    conexion.commit()
+    conexion.close()
+
+
+@pytest.fixture
+def vigilante(db_path):
+    vigilante = VigilanteCambios(db_path, intervalo=3600)
+    yield vigilante
+    vigilante.detener()
+
+
+def test_commit_de_otra_conexion_cambia_data_version(db_path, vigilante):
+    vigilante.iniciar()
+    version = vigilante._conexion.execute("PRAGMA data_version").fetchone()[0]
+    assert vigilante.sincronizar() == 0
+
+    _insertar_cambios(db_path, "A")
+
+    assert vigilante._conexion.execute("PRAGMA data_version").fetchone()[0] != version
+
+
+def test_solo_entrega_cambios_nuevos_en_orden(db_path, vigilante):
+    _insertar_cambios(db_path, "A", "B")
+    recibidos = []
+    vigilante.registrar_oyente(recibidos.append)
+    vigilante.iniciar()
+    assert [evento["clave"] for evento in recibidos] == ["A", "B"]
+
+    recibidos.clear()
+    _insertar_cambios(db_path, "C", "D", "E")
+
+    assert vigilante.sincronizar() == 3
+    assert [(evento["offset"], evento["clave"]) for evento in recibidos] == [(3, "C"), (4, "D"), (5, "E")]
+    assert vigilante.ultima_version == 5
+    assert vigilante.sincronizar() == 0
+
+
+def test_oyente_con_error_no_detiene_la_version(db_path, vigilante):
+    def oyente_roto(evento):
+        raise RuntimeError("fallo")
+
+    recibidos = []
+    vigilante.registrar_oyente(oyente_roto)
+    vigilante.registrar_oyente(recibidos.append)
+    vigilante.iniciar()
+
+    _insertar_cambios(db_path, "A", "B")
+
+    assert vigilante.sincronizar() == 2
+    assert [evento["clave"] for evento in recibidos] == ["A", "B"]
+    assert vigilante.ultima_version == 2
+    _insertar_cambios(db_path, "C")
+    assert vigilante.sincronizar() == 1
+    assert recibidos[-1]["clave"] == "C"
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+from eventos import Difusor
+
+
+def _evento(offset):
+    return {"offset": offset, "entidad": "vehiculo", "accion": "crear", "clave": f"P{offset}", "datos": {}}
+
+
+def _offsets(eventos):
+    return [evento["offset"] for evento in eventos]
+
+
+def test_difusor_reanuda_desde_el_historial():
+    difusor = Difusor(historial_maximo=3)
+    for offset in range(1, 6):
+        difusor.publicar(_evento(offset))
+    difusor.publicar(_evento(4))  # duplicado (p. ej. precarga + sincronización)
+
+    assert difusor.ultimo_offset == 5
+    eventos, completo = difusor.eventos_desde(2)
+    assert (_offsets(eventos), completo) == ([3, 4, 5], True)
+    assert difusor.eventos_desde(5) == ([], True)
+    # Los offsets 1 y 2 ya salieron del historial: el cliente debe recargar
+    eventos, completo = difusor.eventos_desde(1)
+    assert (_offsets(eventos), completo) == ([3, 4, 5], False)
+
+
+def test_difusor_vacio_no_pide_recargar():
+    assert Difusor().eventos_desde(0) == ([], True)
+
+
+def test_suscriptor_recibe_eventos_de_otro_hilo():
+    difusor = Difusor()
+    difusor.publicar(_evento(1))
+
+    async def escuchar():
+        suscriptor, atrasados, completo = difusor.suscribir(desde=0)
+        hilo = threading.Thread(target=difusor.publicar, args=(_evento(2),))
+        hilo.start()
+        eventos = await suscriptor.esperar(timeout=2)
+        hilo.join()
+        difusor.desuscribir(suscriptor)
+        return atrasados, completo, eventos
+
+    atrasados, completo, eventos = asyncio.run(escuchar())
+
+    assert (_offsets(atrasados), completo) == ([1], True)
+    assert _offsets(eventos) == [2]
+
+
+def test_suscriptor_lento_se_desborda():
+    difusor = Difusor()
+
+    async def escuchar():
+        suscriptor, _, _ = difusor.suscribir()
+        suscriptor.maximo = 2
+        for offset in range(1, 4):
+            difusor.publicar(_evento(offset))
+        eventos = await suscriptor.esperar(timeout=2)
+        difusor.publicar(_evento(4))
+        return suscriptor, eventos
+
+    suscriptor, eventos = asyncio.run(escuchar())
+
+    assert suscriptor.desbordado
+    assert eventos == []
+    assert not suscriptor.cola
+
+
+def test_websocket_reanuda_con_desde(cliente, monkeypatch):
+    import main  # después del fixture, que importa main desde la raíz del proyecto
+
+    monkeypatch.setattr(main, "LATIDO_SEGUNDOS", 0.05)
+    for offset in range(1, 4):
+        main.difusor.publicar(_evento(offset))
+
+    with cliente.websocket_connect("/cambios/ws?desde=1") as websocket:
+        assert [websocket.receive_json()["offset"] for _ in range(2)] == [2, 3]
+        assert websocket.receive_json() == {"offset": 3, "entidad": "feed", "accion": "latido"}
+
+
+def test_websocket_pide_reiniciar_si_el_historial_no_alcanza(cliente, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "LATIDO_SEGUNDOS", 0.05)
+    monkeypatch.setattr(main, "difusor", Difusor(historial_maximo=2))
+    for offset in range(1, 5):
+        main.difusor.publicar(_evento(offset))
+
+    with cliente.websocket_connect("/cambios/ws?desde=1") as websocket:
+        assert websocket.receive_json() == {"offset": 4, "entidad": "feed", "accion": "reiniciar"}
@@ -0,0 +1,72 @@
+import sqlite3
+from datetime import datetime
+
+import exportacion
+from exportacion import consultar, exportar
+from retencion import Retencion
+from conftest import crear_compra, crear_usuario, crear_vehiculo, dar_de_baja
+
+
+def _ids_exportados(directorio):
+    return sorted(consultar(columnas=["id"], directorio=directorio)["id"].to_pylist())
+
+
+def test_exportacion_incremental_despues_de_archivar(session, db_path, archivo_path, tmp_path):
+    directorio = str(tmp_path / "exportaciones")
+    crear_usuario(session, "1")
+    vendido = crear_vehiculo(session, "AAA111")
+    crear_vehiculo(session, "BBB222")
+    crear_compra(session, "1", "AAA111", 1.0, fecha=datetime(2025, 1, 15))
+    id_archivada = crear_compra(session, "1", "AAA111", 2.0, fecha=datetime(2025, 2, 15)).id
+    assert exportar(db_path, directorio, archivo_path)["filas"] == 2
+
+    dar_de_baja(session, vendido)
+    Retencion(db_path, archivo_path).ejecutar(dias=0)
+    id_nueva = crear_compra(session, "1", "BBB222", 3.0, fecha=datetime(2025, 3, 15)).id
+
+    resumen = exportar(db_path, directorio, archivo_path)
+
+    assert id_nueva > id_archivada
+    assert resumen["filas"] == 1
+    assert _ids_exportados(directorio) == [1, id_archivada, id_nueva]
+
+
+def test_exportacion_completa_incluye_compras_archivadas(session, db_path, archivo_path, tmp_path):
+    directorio = str(tmp_path / "exportaciones")
+    crear_usuario(session, "1")
+    vendido = crear_vehiculo(session, "AAA111", marca="MAZDA")
+    crear_compra(session, "1", "AAA111", 1.0, fecha=datetime(2025, 1, 15))
+    exportar(db_path, directorio, archivo_path)
+    dar_de_baja(session, vendido)
+    Retencion(db_path, archivo_path).ejecutar(dias=0)
+
+    resumen = exportar(db_path, directorio, archivo_path, completo=True)
+
+    assert resumen["filas"] == 1
+    tabla = consultar(meses=["2025-01"], directorio=directorio)
+    assert tabla["marca"].to_pylist() == ["MAZDA"]
+
+
+def test_exportacion_no_bloquea_escrituras(session, db_path, archivo_path, tmp_path, monkeypatch):
+    crear_usuario(session, "1")
+    crear_vehiculo(session, "AAA111")
+    for precio in (1.0, 2.0, 3.0):
+        crear_compra(session, "1", "AAA111", precio)
+    original = exportacion._bloque_a_columnas
+    escrituras = []
+
+    def escribir_durante_el_stream(filas):
+        # Con la exportación a mitad de camino, la API debe poder escribir sin esperar
+        conexion = sqlite3.connect(db_path, timeout=0)
+        conexion.execute("UPDATE vehiculo SET precio = precio + 1 WHERE placa = 'AAA111'")
+        conexion.commit()
+        conexion.close()
+        escrituras.append(len(filas))
+        return original(filas)
+
+    monkeypatch.setattr(exportacion, "_bloque_a_columnas", escribir_durante_el_stream)
+
+    resumen = exportar(db_path, str(tmp_path / "exportaciones"), archivo_path, filas_por_bloque=1)
+
+    assert resumen["filas"] == 3
+    assert escrituras == [1, 1, 1]
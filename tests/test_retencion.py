@@ -0,0 +1,227 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import migrar_esquema
+from models import Usuario
+from retencion import NoArchivadoError, RestauracionError, Retencion, RetencionEnCursoError
+from conftest import crear_compra, crear_usuario, crear_vehiculo, dar_de_baja
+
+
+def _filas(db, archivo, consulta):
+    conexion = sqlite3.connect(db)
+    conexion.execute("ATTACH DATABASE ? AS archivo", (archivo,))
+    try:
+        return conexion.execute(consulta).fetchall()
+    finally:
+        conexion.close()
+
+
+def test_archivar_y_restaurar_vehiculo(session, db_path, archivo_path):
+    crear_usuario(session, "1")
+    vehiculo = crear_vehiculo(session, "AAA111", con_ficha=True)
+    crear_compra(session, "1", "AAA111", 1.0)
+    dar_de_baja(session, vehiculo)
+    retencion = Retencion(db_path, archivo_path)
+
+    reporte = retencion.ejecutar(dias=0)
+
+    assert reporte["archivados"]["vehiculo"] == 1
+    assert reporte["archivados"]["fichatecnica"] == 1
+    assert reporte["archivados"]["compra"] == 1
+    assert _filas(db_path, archivo_path, "SELECT placa FROM main.vehiculo") == []
+    assert reporte["antes"]["bytes_tablas"]["vehiculo"] > 0
+    assert "ix_compra_vehiculo_placa" in reporte["despues"]["bytes_tablas"]
+
+    restaurados = retencion.restaurar_vehiculo("AAA111")
+
+    assert restaurados == {"vehiculo": 1, "fichatecnica": 1, "compra": 1}
+    assert _filas(db_path, archivo_path, "SELECT placa, estado, fecha_baja FROM main.vehiculo") == [("AAA111", 1, None)]
+    assert _filas(db_path, archivo_path, "SELECT COUNT(*) FROM archivo.compra") == [(0,)]
+    with pytest.raises(NoArchivadoError):
+        retencion.restaurar_vehiculo("AAA111")
+
+
+def test_restaurado_no_se_vuelve_a_archivar(session, db_path, archivo_path):
+    crear_usuario(session, "1")
+    dar_de_baja(session, crear_vehiculo(session, "AAA111"), hace_dias=200)
+    retencion = Retencion(db_path, archivo_path)
+    assert retencion.ejecutar(dias=180)["archivados"]["vehiculo"] == 1
+
+    retencion.restaurar_vehiculo("AAA111")
+    reporte = retencion.ejecutar(dias=180)
+
+    assert reporte["archivados"]["vehiculo"] == 0
+    assert _filas(db_path, archivo_path, "SELECT placa, estado FROM main.vehiculo") == [("AAA111", 1)]
+
+
+def test_restaurar_con_email_ocupado_es_conflicto(session, db_path, archivo_path):
+    dar_de_baja(session, crear_usuario(session, "1"))
+    retencion = Retencion(db_path, archivo_path)
+    retencion.ejecutar(dias=0)
+    session.add(Usuario(cedula="2", nombres_completo="Otro", celular="300", email="1@correo.com", edad=30))
+    session.commit()
+
+    with pytest.raises(RestauracionError):
+        retencion.restaurar_usuario("1")
+
+    assert _filas(db_path, archivo_path, "SELECT cedula FROM archivo.usuario") == [("1",)]
+    assert _filas(db_path, archivo_path, "SELECT cedula FROM main.usuario") == [("2",)]
+
+
+def test_archivo_no_pierde_compras_cuando_se_reutilizaria_el_id(session, db_path, archivo_path):
+    crear_usuario(session, "1")
+    crear_usuario(session, "2")
+    crear_vehiculo(session, "AAA111")
+    vendido = crear_vehiculo(session, "BBB222")
+    crear_compra(session, "1", "AAA111", 1.0)
+    id_archivada = crear_compra(session, "2", "BBB222", 2.0).id
+    dar_de_baja(session, vendido)
+    retencion = Retencion(db_path, archivo_path)
+    retencion.ejecutar(dias=0)
+
+    otro = crear_vehiculo(session, "CCC333")
+    id_nueva = crear_compra(session, "1", "CCC333", 99.0).id
+    dar_de_baja(session, otro)
+    retencion.ejecutar(dias=0)
+
+    assert id_nueva > id_archivada
+    assert _filas(db_path, archivo_path, "SELECT id, comprador_cedula, precio_final FROM archivo.compra ORDER BY id") == [
+        (id_archivada, "2", 2.0),
+        (id_nueva, "1", 99.0),
+    ]
+
+
+def test_placa_registrada_de_nuevo_se_archiva_dos_veces(session, db_path, archivo_path):
+    retencion = Retencion(db_path, archivo_path)
+    dar_de_baja(session, crear_vehiculo(session, "AAA111", marca="KIA"))
+    retencion.ejecutar(dias=0)
+    session.expunge_all()
+    dar_de_baja(session, crear_vehiculo(session, "AAA111", marca="MAZDA"))
+    retencion.ejecutar(dias=0)
+
+    assert _filas(db_path, archivo_path, "SELECT marca FROM archivo.vehiculo ORDER BY archivo_id") == [("KIA",), ("MAZDA",)]
+
+    retencion.restaurar_vehiculo("AAA111")
+
+    assert _filas(db_path, archivo_path, "SELECT marca FROM main.vehiculo") == [("MAZDA",)]
+    assert _filas(db_path, archivo_path, "SELECT marca FROM archivo.vehiculo") == [("KIA",)]
+
+
+def test_migracion_compra_autoincrement(tmp_path):
+    ruta = str(tmp_path / "antigua.db")
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript("""
+        CREATE TABLE compra (
+            precio_final FLOAT NOT NULL, tipo_pago VARCHAR NOT NULL, fecha_compra DATETIME NOT NULL,
+            id INTEGER NOT NULL, estado VARCHAR NOT NULL, comprador_cedula VARCHAR NOT NULL,
+            vehiculo_placa VARCHAR NOT NULL, PRIMARY KEY (id));
+        CREATE INDEX ix_compra_vehiculo_placa ON compra (vehiculo_placa);
+        CREATE INDEX ix_compra_comprador_cedula ON compra (comprador_cedula);
+        INSERT INTO compra VALUES (1.0, 'Efectivo', '2025-01-01 00:00:00.000000', 7, 'Completada', '1', 'AAA111');
+    """)
+    conexion.close()
+
+    migrar_esquema(ruta)
+
+    conexion = sqlite3.connect(ruta)
+    sql = conexion.execute("SELECT sql FROM sqlite_master WHERE name = 'compra'").fetchone()[0]
+    assert "AUTOINCREMENT" in sql
+    assert conexion.execute("SELECT id, precio_final FROM compra").fetchall() == [(7, 1.0)]
+    conexion.execute("DELETE FROM compra")
+    conexion.execute("INSERT INTO compra (precio_final, tipo_pago, fecha_compra, estado, comprador_cedula, vehiculo_placa) "
+                     "VALUES (2.0, 'Efectivo', '2025-01-02 00:00:00.000000', 'Completada', '1', 'AAA111')")
+    assert conexion.execute("SELECT id FROM compra").fetchall() == [(8,)]
+    conexion.close()
+
+
+def test_edad_de_retencion_se_mide_desde_la_baja(session, db_path, archivo_path):
+    antiguo = crear_usuario(session, "1")
+    antiguo.fecha_registro = antiguo.fecha_registro.replace(year=antiguo.fecha_registro.year - 2)
+    dar_de_baja(session, antiguo)
+    dar_de_baja(session, crear_usuario(session, "2"), hace_dias=200)
+    # Inactivo sin fecha_baja: la edad es desconocida y no se archiva
+    crear_usuario(session, "3", activo=False)
+
+    reporte = Retencion(db_path, archivo_path).ejecutar(dias=180)
+
+    assert reporte["archivados"]["usuario"] == 1
+    assert _filas(db_path, archivo_path, "SELECT cedula FROM archivo.usuario") == [("2",)]
+    assert sorted(_filas(db_path, archivo_path, "SELECT cedula FROM main.usuario")) == [("1",), ("3",)]
+
+
+def test_migracion_fecha_baja_usa_el_cambio_eliminar(session, db_path):
+    dar_de_baja(session, crear_usuario(session, "1"))
+    conexion = sqlite3.connect(db_path)
+    # Esquema anterior: sin columna fecha_baja, con la baja registrada solo en Cambio
+    conexion.executescript("""
+        ALTER TABLE usuario DROP COLUMN fecha_baja;
+        INSERT INTO cambio (entidad, accion, clave, datos, fecha)
+        VALUES ('usuario', 'eliminar', '1', '{}', '2025-01-01 00:00:00.000000');
+    """)
+    conexion.close()
+
+    migrar_esquema(db_path)
+
+    conexion = sqlite3.connect(db_path)
+    assert conexion.execute("SELECT fecha_baja FROM usuario").fetchall() == [("2025-01-01 00:00:00.000000",)]
+    conexion.close()
+
+
+def _worker(db_path, archivo_path, nombre):
+    retencion = Retencion(db_path, archivo_path)
+    retencion.dueno = nombre
+    return retencion
+
+
+def test_un_solo_worker_ejecuta_y_todos_ven_el_reporte(db_path, archivo_path):
+    worker_a = _worker(db_path, archivo_path, "a")
+    worker_b = _worker(db_path, archivo_path, "b")
+    vence = (datetime.utcnow() + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("INSERT INTO turnomantenimiento (nombre, dueno, vence) VALUES ('retencion', 'a', ?)", (vence,))
+    conexion.commit()
+    conexion.close()
+
+    with pytest.raises(RetencionEnCursoError):
+        worker_b.ejecutar(dias=0)
+
+    reporte = worker_a.ejecutar(dias=0)
+
+    assert worker_b.ultimo_reporte() == reporte
+    # El programador de otro worker ve que la ejecución del intervalo ya está hecha
+    hace_un_dia = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    assert worker_b.ejecutar(dias=0, pendiente_desde=hace_un_dia) is None
+    assert worker_b.ejecutar(dias=0)["worker"] == "b"
+
+
+def test_turno_vencido_lo_toma_otro_worker(db_path, archivo_path):
+    vencido = (datetime.utcnow() - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("INSERT INTO turnomantenimiento (nombre, dueno, vence) VALUES ('retencion', 'muerto', ?)", (vencido,))
+    conexion.commit()
+    conexion.close()
+
+    assert _worker(db_path, archivo_path, "b").ejecutar(dias=0)["worker"] == "b"
+    assert _filas(db_path, archivo_path, "SELECT COUNT(*) FROM main.turnomantenimiento") == [(0,)]
+
+
+def test_vacuum_incremental_libera_paginas(db_path, archivo_path):
+    retencion = Retencion(db_path, archivo_path)
+    assert retencion.ejecutar(dias=0)["compactacion"] == "vacuum_completo"
+    conexion = sqlite3.connect(db_path)
+    conexion.executemany(
+        "INSERT INTO cambio (entidad, accion, clave, datos, fecha) VALUES ('prueba', 'crear', ?, ?, ?)",
+        [(str(i), "x" * 2000, "2000-01-01 00:00:00.000000") for i in range(500)],
+    )
+    conexion.commit()
+    conexion.execute("DELETE FROM cambio WHERE entidad = 'prueba'")
+    conexion.commit()
+    conexion.close()
+
+    reporte = retencion.ejecutar(dias=0)
+
+    assert reporte["compactacion"] == "vacuum_incremental"
+    assert reporte["antes"]["paginas_libres"] > 100
+    assert reporte["despues"]["paginas_libres"] == 0